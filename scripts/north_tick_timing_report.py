@@ -3,20 +3,34 @@ from __future__ import annotations
 
 import argparse
 import csv
+import io
+import itertools
+import os
 import subprocess
+import sys
 from pathlib import Path
-from typing import Dict, Tuple
+from typing import Dict, List, Mapping, Optional, Sequence, TextIO, Tuple
 
 from perf_schema import (
+    CSV_READ_BUFFER,
+    CSV_WRITE_BUFFER,
     MetricSpec,
     apply_profile_limits,
-    evaluate_row_against_limits,
-    render_markdown_table,
-    summarize_rows,
+    column_picker,
+    evaluate_row_fast,
+    example_output_is_fresh,
+    metric_signs,
+    non_numeric_metrics,
+    parse_metric_values,
+    summarize_values,
+    write_markdown_table,
+    write_text_atomic,
 )
 
 EPSILON = 1e-3
 
+EXAMPLE = "north_tick_timing_metrics"
+
 METRICS = [
     MetricSpec("detection_rate", "min", lambda x: x + 0.02, "detection_rate", "{:.6f}"),
     MetricSpec("false_positive_rate", "max", lambda x: x - 0.02, "false_positive_rate", "{:.6f}"),
@@ -86,6 +100,55 @@ for mode in ("dpll", "simple"):
         merged.update(MODE_SCENARIO_OVERRIDES.get((mode, scenario), {}))
         BASELINE_LIMITS[(mode, scenario)] = merged
 
+SORTED_BASELINE_KEYS = tuple(sorted(BASELINE_LIMITS))
+
+PROFILE_LIMITS: Dict[str, Dict[Tuple[str, str], Dict[str, float]]] = {
+    profile: apply_profile_limits(BASELINE_LIMITS, METRICS, profile) for profile in ("baseline", "strict")
+}
+
+METRIC_NAMES = tuple(m.name for m in METRICS)
+METRIC_FORMATTERS = tuple((m.name, m.formatter) for m in METRICS)
+METRIC_SIGNS = metric_signs(METRICS)
+LIMIT_FIELDS = tuple(f"limit_{name}" for name in METRIC_NAMES)
+EMPTY_LIMITS = ("",) * len(METRICS)
+
+
+def limit_vectors_for(
+    limits_by_key: Mapping[Tuple[str, str], Mapping[str, float]],
+) -> Dict[Tuple[str, str], Tuple[float, ...]]:
+    return {key: tuple(limits[name] for name in METRIC_NAMES) for key, limits in limits_by_key.items()}
+
+
+PROFILE_LIMIT_VECTORS = {profile: limit_vectors_for(limits) for profile, limits in PROFILE_LIMITS.items()}
+
+
+def threshold_set_name(mode: str, scenario: str) -> str:
+    if (mode, scenario) == ("simple", "impulsive_interference"):
+        return "impulsive_interference_simple_mode"
+    return scenario
+
+
+# Limits are fixed per profile, so the formatted threshold table is too.
+THRESHOLD_TABLE_ROWS = {
+    profile: tuple(
+        (
+            mode,
+            scenario,
+            threshold_set_name(mode, scenario),
+            *(fmt(limits[(mode, scenario)][name]) for name, fmt in METRIC_FORMATTERS),
+        )
+        for mode, scenario in SORTED_BASELINE_KEYS
+    )
+    for profile, limits in PROFILE_LIMITS.items()
+}
+
+# Parsed metrics CSV: header, records, and per record its (mode, scenario) key
+# and metric floats in METRIC_NAMES order (None if any metric is not a number),
+# so check and summary parse once.
+MetricsTable = Tuple[List[str], List[List[str]], List[Tuple[str, str]], List[Optional[List[float]]]]
+
+FAILED_ROWS_MD_COLUMNS = ("mode", "scenario", "chunk_size", "start_offset_s") + METRIC_NAMES + LIMIT_FIELDS + ("reason",)
+
 
 def paths(out_dir: Path, profile: str) -> tuple[Path, Path, Path]:
     return (
@@ -97,136 +160,163 @@ def paths(out_dir: Path, profile: str) -> tuple[Path, Path, Path]:
 
 def run_example(csv_path: Path) -> None:
     csv_path.parent.mkdir(parents=True, exist_ok=True)
-    with csv_path.open("w", encoding="utf-8") as out:
-        subprocess.run(
-            ["cargo", "run", "--release", "--example", "north_tick_timing_metrics"],
-            check=True,
-            stdout=out,
-        )
+    # A failed run must not leave a fresh-looking CSV for --reuse-csv to pick up.
+    tmp_path = csv_path.with_name(csv_path.name + ".tmp")
+    try:
+        with tmp_path.open("w", encoding="utf-8") as out:
+            subprocess.run(
+                ["cargo", "run", "--release", "--example", EXAMPLE],
+                check=True,
+                stdout=out,
+            )
+        os.replace(tmp_path, csv_path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+
+def refresh_csv(csv_path: Path, reuse: bool) -> None:
+    if reuse and example_output_is_fresh(csv_path, EXAMPLE):
+        print(f"Reusing {csv_path} (newer than example sources)")
+        return
+    print("Running north tick timing metrics example...")
+    run_example(csv_path)
+    print(f"Wrote {csv_path}")
 
 
 def evaluate_thresholds(
-    rows: list[dict[str, str]],
+    table: MetricsTable,
     profile: str,
     overrides: dict[str, float | None],
-) -> tuple[list[str], list[dict[str, str]]]:
-    profile_limits = apply_profile_limits(BASELINE_LIMITS, METRICS, profile)
+) -> tuple[list[str], list[tuple[str, ...]]]:
+    fields, records, keys, values = table
+    profile_limits = PROFILE_LIMITS[profile]
+    active_overrides = {name: float(value) for name, value in overrides.items() if value is not None}
+    if active_overrides:
+        limits_by_key = {key: {**limits, **active_overrides} for key, limits in profile_limits.items()}
+        limit_vectors = limit_vectors_for(limits_by_key)
+    else:
+        limits_by_key = profile_limits
+        limit_vectors = PROFILE_LIMIT_VECTORS[profile]
     failures: list[str] = []
-    failed_rows: list[dict[str, str]] = []
+    failed_rows: list[tuple[str, ...]] = []
 
-    for row in rows:
-        key = (row["mode"], row["scenario"])
-        if key not in BASELINE_LIMITS:
-            failures.append(f"FAIL unknown mode/scenario row: {row}")
-            failed_rows.append(
-                {
-                    **row,
-                    **{f"limit_{m.name}": "" for m in METRICS},
-                    "reason": "unknown mode/scenario",
-                }
-            )
+    for record, key, row_values in zip(records, keys, values):
+        limit_vector = limit_vectors.get(key)
+        if limit_vector is None:
+            failures.append(f"FAIL unknown mode/scenario row: {dict(zip(fields, record))}")
+            failed_rows.append((*record, *EMPTY_LIMITS, "unknown mode/scenario"))
+            continue
+        if row_values is None:
+            row = dict(zip(fields, record))
+            columns = ",".join(non_numeric_metrics(row, METRICS))
+            failures.append(f"FAIL non-numeric metric row: {row} (columns={columns})")
+            failed_rows.append((*record, *EMPTY_LIMITS, f"non-numeric metric: {columns}"))
             continue
 
-        limits = dict(profile_limits[key])
-        if overrides["detection_rate"] is not None:
-            limits["detection_rate"] = float(overrides["detection_rate"])
-        if overrides["false_positive_rate"] is not None:
-            limits["false_positive_rate"] = float(overrides["false_positive_rate"])
-        if overrides["mean_abs_error_samples"] is not None:
-            limits["mean_abs_error_samples"] = float(overrides["mean_abs_error_samples"])
-        if overrides["p95_abs_error_samples"] is not None:
-            limits["p95_abs_error_samples"] = float(overrides["p95_abs_error_samples"])
-
-        violations = evaluate_row_against_limits(row, limits, METRICS, EPSILON)
-        if violations:
-            observed = " ".join(f"{m.name}={m.format_value(float(row[m.name]))}" for m in METRICS)
-            limits_text = " ".join(f"limit_{m.name}={m.format_value(limits[m.name])}" for m in METRICS)
+        violated = evaluate_row_fast(row_values, limit_vector, METRIC_SIGNS, EPSILON)
+        if violated:
+            row = dict(zip(fields, record))
+            limits = limits_by_key[key]
+            violations = [METRIC_NAMES[i] for i in violated]
+            observed = " ".join([f"{name}={fmt(float(row[name]))}" for name, fmt in METRIC_FORMATTERS])
+            limits_text = " ".join([f"limit_{name}={fmt(limits[name])}" for name, fmt in METRIC_FORMATTERS])
             failures.append(
                 f"FAIL row: {row} ({observed}; {limits_text}; violations={','.join(violations)})"
             )
             failed_rows.append(
-                {
-                    **row,
-                    **{f"limit_{m.name}": m.format_value(limits[m.name]) for m in METRICS},
-                    "reason": "threshold exceeded",
-                }
+                (*record, *(fmt(limits[name]) for name, fmt in METRIC_FORMATTERS), "threshold exceeded")
             )
 
     return failures, failed_rows
 
 
-def write_failed_rows_csv(rows: list[dict[str, str]], failed_rows_path: Path, input_rows: list[dict[str, str]]) -> None:
+def write_failed_rows_csv(rows: list[tuple[str, ...]], failed_rows_path: Path, input_fields: Sequence[str]) -> None:
     failed_rows_path.parent.mkdir(parents=True, exist_ok=True)
-    input_fields = list(input_rows[0].keys()) if input_rows else []
-    limit_fields = [f"limit_{m.name}" for m in METRICS]
-    fieldnames = input_fields + limit_fields + ["reason"]
-    with failed_rows_path.open("w", newline="", encoding="utf-8") as fh:
-        writer = csv.DictWriter(fh, fieldnames=fieldnames)
-        writer.writeheader()
-        for row in rows:
-            writer.writerow(row)
-
-
-def build_summary_lines(rows: list[dict[str, str]], profile: str) -> list[str]:
-    grouped = summarize_rows(rows, group_keys=["mode", "scenario"], metrics=METRICS)
-    profile_limits = apply_profile_limits(BASELINE_LIMITS, METRICS, profile)
-
-    lines = [
-        "# North Tick Timing Metrics Summary",
-        "",
-        f"- Profile: `{profile}`",
-        "- This markdown file is the detailed metrics artifact generated from CSV.",
-        "- CI step-summary status notes are separate and only indicate pass/fail state.",
-        "",
-        "## Threshold Profile",
-        "",
-    ]
+    with failed_rows_path.open("w", newline="", encoding="utf-8", buffering=CSV_WRITE_BUFFER) as fh:
+        writer = csv.writer(fh)
+        writer.writerow(failed_rows_fields(input_fields))
+        writer.writerows(rows)
+
+
+def read_metrics_csv(csv_path: Path) -> MetricsTable:
+    with csv_path.open(newline="", encoding="utf-8", buffering=CSV_READ_BUFFER) as fh:
+        reader = csv.reader(fh)
+        fields = next(reader, [])
+        records = [row for row in reader if row]
+    if not fields:
+        return fields, records, [], []
+    index = {name: i for i, name in enumerate(fields)}
+    mode_col, scenario_col = index["mode"], index["scenario"]
+    metric_cols = [index[name] for name in METRIC_NAMES]
+    keys = [(record[mode_col], record[scenario_col]) for record in records]
+    values = [parse_metric_values(record, metric_cols) for record in records]
+    return fields, records, keys, values
+
+
+def build_summary(table: MetricsTable, profile: str) -> io.StringIO:
+    _, _, keys, values = table
+    # Non-numeric rows are reported by the threshold check, not summarized.
+    grouped = summarize_values(
+        ((key, row_values) for key, row_values in zip(keys, values) if row_values is not None), METRICS
+    )
+
+    out = io.StringIO()
+    w = out.write
+    w("# North Tick Timing Metrics Summary\n")
+    w("\n")
+    w(f"- Profile: `{profile}`\n")
+    w("- This markdown file is the detailed metrics artifact generated from CSV.\n")
+    w("- CI step-summary status notes are separate and only indicate pass/fail state.\n")
+    w("\n")
+    w("## Threshold Profile\n")
+    w("\n")
     if profile == "baseline":
-        lines.extend(["Using baseline thresholds.", ""])
+        w("Using baseline thresholds.\n\n")
     else:
-        lines.extend(
-            [
-                "Using strict thresholds derived from metric transforms:",
-                "",
-                "- `detection_rate + 0.02`",
-                "- `false_positive_rate - 0.02`",
-                "- `mean_abs_error_samples - 0.15`",
-                "- `p95_abs_error_samples - 0.25`",
-                "",
-            ]
+        w(
+            "Using strict thresholds derived from metric transforms:\n"
+            "\n"
+            "- `detection_rate + 0.02`\n"
+            "- `false_positive_rate - 0.02`\n"
+            "- `mean_abs_error_samples - 0.15`\n"
+            "- `p95_abs_error_samples - 0.25`\n"
+            "\n"
         )
 
     threshold_headers = ["mode", "scenario", "threshold set"] + [f"limit {m.display_name}" for m in METRICS]
     threshold_aligns = ["left", "left", "left"] + ["right"] * len(METRICS)
-    threshold_rows = []
-    for mode, scenario in sorted(BASELINE_LIMITS.keys()):
-        threshold_set = "impulsive_interference_simple_mode" if (mode, scenario) == ("simple", "impulsive_interference") else scenario
-        lim = profile_limits[(mode, scenario)]
-        threshold_rows.append([mode, scenario, threshold_set] + [m.format_value(lim[m.name]) for m in METRICS])
-    lines.extend(render_markdown_table(threshold_headers, threshold_aligns, threshold_rows))
-
-    lines.extend(["", "## Metrics", ""])
+    write_markdown_table(out, threshold_headers, threshold_aligns, THRESHOLD_TABLE_ROWS[profile])
+
+    w("\n## Metrics\n\n")
     metric_headers = ["mode", "scenario", "rows"] + [m.display_name for m in METRICS]
     metric_aligns = ["left", "left", "right"] + ["right"] * len(METRICS)
-    metric_rows = []
-    for mode, scenario in sorted(grouped.keys()):
-        s = grouped[(mode, scenario)]
-        metric_rows.append([mode, scenario, str(int(s["rows"]))] + [m.format_value(s[m.name]) for m in METRICS])
-    lines.extend(render_markdown_table(metric_headers, metric_aligns, metric_rows))
-    return lines
+    write_markdown_table(
+        out,
+        metric_headers,
+        metric_aligns,
+        (
+            (mode, scenario, str(int(s["rows"])), *(fmt(s[name]) for name, fmt in METRIC_FORMATTERS))
+            for (mode, scenario), s in sorted(grouped.items())
+        ),
+    )
+    return out
 
 
-def append_failed_rows_md(lines: list[str], failed_rows_path: Path, max_rows: int) -> list[str]:
-    lines.extend(["", "## Threshold Check", ""])
-    if not failed_rows_path.exists():
-        lines.append(f"`{failed_rows_path}` not found.")
-        return lines
-    rows = list(csv.DictReader(failed_rows_path.open(newline="", encoding="utf-8")))
-    if not rows:
-        lines.append("No threshold failures.")
-        return lines
-    lines.append(f"Threshold failures: {len(rows)} row(s)")
-    lines.append("")
+def failed_rows_fields(input_fields: Sequence[str]) -> list[str]:
+    return [*input_fields, *LIMIT_FIELDS, "reason"]
+
+
+def write_failed_rows_md(
+    out: TextIO,
+    fields: Sequence[str],
+    rows: Sequence[Sequence[str]],
+    total: int,
+    max_rows: int,
+) -> None:
+    if total == 0:
+        out.write("No threshold failures.\n")
+        return
+    out.write(f"Threshold failures: {total} row(s)\n\n")
     headers = (
         ["mode", "scenario", "chunk", "offset"]
         + [m.display_name for m in METRICS]
@@ -234,59 +324,71 @@ def append_failed_rows_md(lines: list[str], failed_rows_path: Path, max_rows: in
         + ["reason"]
     )
     aligns = ["left", "left", "right", "right"] + ["right"] * (len(METRICS) * 2) + ["left"]
-    table_rows = []
-    for row in rows[:max_rows]:
-        table_rows.append(
-            [
-                row.get("mode", ""),
-                row.get("scenario", ""),
-                row.get("chunk_size", ""),
-                row.get("start_offset_s", ""),
-                *[row.get(m.name, "") for m in METRICS],
-                *[row.get(f"limit_{m.name}", "") for m in METRICS],
-                row.get("reason", ""),
-            ]
-        )
-    lines.extend(render_markdown_table(headers, aligns, table_rows))
-    if len(rows) > max_rows:
-        lines.extend(["", f"Showing first {max_rows} rows."])
-    return lines
+    pick = column_picker(fields, FAILED_ROWS_MD_COLUMNS)
+    write_markdown_table(out, headers, aligns, map(pick, rows[:max_rows]))
+    if total > max_rows:
+        out.write(f"\nShowing first {max_rows} rows.\n")
 
 
-def write_summary(csv_path: Path, summary_path: Path, profile: str, failed_rows_path: Path | None, max_rows: int) -> None:
-    rows = list(csv.DictReader(csv_path.open(newline="", encoding="utf-8")))
-    lines = build_summary_lines(rows, profile)
-    if failed_rows_path is not None:
-        lines = append_failed_rows_md(lines, failed_rows_path, max_rows)
-    summary_path.parent.mkdir(parents=True, exist_ok=True)
-    summary_path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+def append_failed_rows_md(out: TextIO, failed_rows_path: Path, max_rows: int) -> None:
+    out.write("\n## Threshold Check\n\n")
+    if not failed_rows_path.exists():
+        out.write(f"`{failed_rows_path}` not found.\n")
+        return
+    with failed_rows_path.open(newline="", encoding="utf-8") as fh:
+        reader = csv.reader(fh)
+        fields = next(reader, [])
+        records = (row for row in reader if row)
+        rows = list(itertools.islice(records, max_rows))
+        total = len(rows) + sum(1 for _ in records)
+    write_failed_rows_md(out, fields, rows, total, max_rows)
+
+
+def write_summary(
+    csv_path: Path,
+    summary_path: Path,
+    profile: str,
+    failed_rows_path: Path | None,
+    max_rows: int,
+    table: MetricsTable | None = None,
+    failed_rows: tuple[Sequence[str], list[tuple[str, ...]]] | None = None,
+) -> None:
+    if table is None:
+        table = read_metrics_csv(csv_path)
+    out = build_summary(table, profile)
+    if failed_rows is not None:
+        fields, failed = failed_rows
+        out.write("\n## Threshold Check\n\n")
+        write_failed_rows_md(out, fields, failed, len(failed), max_rows)
+    elif failed_rows_path is not None:
+        append_failed_rows_md(out, failed_rows_path, max_rows)
+    write_text_atomic(summary_path, out.getvalue())
 
 
 def print_failed_rows_md(failed_rows_path: Path, title: str, max_rows: int) -> None:
-    lines = [f"## {title}", ""]
-    append_failed_rows_md(lines, failed_rows_path, max_rows)
-    print("\n".join(lines))
+    out = io.StringIO()
+    out.write(f"## {title}\n\n")
+    append_failed_rows_md(out, failed_rows_path, max_rows)
+    sys.stdout.write(out.getvalue())
 
 
 def cmd_run(args: argparse.Namespace) -> int:
     csv_path, _, _ = paths(args.out_dir, args.profile)
-    print("Running north tick timing metrics example...")
-    run_example(csv_path)
-    print(f"Wrote {csv_path}")
+    refresh_csv(csv_path, args.reuse_csv)
     return 0
 
 
 def cmd_check(args: argparse.Namespace) -> int:
     csv_path, _, failed_rows_path = paths(args.out_dir, args.profile)
-    rows = list(csv.DictReader(csv_path.open(newline="", encoding="utf-8")))
+    table = read_metrics_csv(csv_path)
     overrides = {
         "detection_rate": args.override_min_det,
         "false_positive_rate": args.override_max_fp,
         "mean_abs_error_samples": args.override_max_mean,
         "p95_abs_error_samples": args.override_max_p95,
     }
-    failures, failed_rows = evaluate_thresholds(rows, args.profile, overrides)
-    write_failed_rows_csv(failed_rows, failed_rows_path, rows)
+    failures, failed_rows = evaluate_thresholds(table, args.profile, overrides)
+    write_failed_rows_csv(failed_rows, failed_rows_path, table[0])
     print(f"Wrote {failed_rows_path}")
     if failures:
         for failure in failures:
@@ -309,34 +411,55 @@ def cmd_failed_rows(args: argparse.Namespace) -> int:
     return 0
 
 
-def cmd_ci(args: argparse.Namespace) -> int:
-    csv_path, summary_path, failed_rows_path = paths(args.out_dir, args.profile)
-    print("Running north tick timing metrics example...")
-    run_example(csv_path)
-    print(f"Wrote {csv_path}")
+def check_and_summarize(
+    csv_path: Path,
+    out_dir: Path,
+    profile: str,
+    overrides: dict[str, float | None],
+    max_rows: int,
+) -> list[str]:
+    _, summary_path, failed_rows_path = paths(out_dir, profile)
+    table = read_metrics_csv(csv_path)
+    failures, failed_rows = evaluate_thresholds(table, profile, overrides)
+    write_failed_rows_csv(failed_rows, failed_rows_path, table[0])
+    write_summary(
+        csv_path,
+        summary_path,
+        profile,
+        failed_rows_path,
+        max_rows,
+        table,
+        (failed_rows_fields(table[0]), failed_rows),
+    )
+    return failures
 
-    rows = list(csv.DictReader(csv_path.open(newline="", encoding="utf-8")))
-    overrides = {
-        "detection_rate": args.override_min_det,
-        "false_positive_rate": args.override_max_fp,
-        "mean_abs_error_samples": args.override_max_mean,
-        "p95_abs_error_samples": args.override_max_p95,
-    }
-    failures, failed_rows = evaluate_thresholds(rows, args.profile, overrides)
-    write_failed_rows_csv(failed_rows, failed_rows_path, rows)
-    print(f"Wrote {failed_rows_path}")
 
-    write_summary(csv_path, summary_path, args.profile, failed_rows_path, args.max_rows)
+def report_profile(out_dir: Path, profile: str, failures: list[str]) -> int:
+    _, summary_path, failed_rows_path = paths(out_dir, profile)
+    print(f"Wrote {failed_rows_path}")
     print(f"Wrote {summary_path}")
-
     if failures:
         for failure in failures:
             print(failure)
         return 1
-    print(f"North tick timing metrics thresholds ({args.profile}): PASS")
+    print(f"North tick timing metrics thresholds ({profile}): PASS")
     return 0
 
 
+def cmd_ci(args: argparse.Namespace) -> int:
+    csv_path, _, _ = paths(args.out_dir, args.profile)
+    refresh_csv(csv_path, args.reuse_csv)
+
+    overrides = {
+        "detection_rate": args.override_min_det,
+        "false_positive_rate": args.override_max_fp,
+        "mean_abs_error_samples": args.override_max_mean,
+        "p95_abs_error_samples": args.override_max_p95,
+    }
+    failures = check_and_summarize(csv_path, args.out_dir, args.profile, overrides, args.max_rows)
+    return report_profile(args.out_dir, args.profile, failures)
+
+
 def build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(description="North tick timing report tool")
     sub = parser.add_subparsers(dest="command", required=True)
@@ -356,6 +479,8 @@ def build_parser() -> argparse.ArgumentParser:
             p.add_argument("--max-rows", type=int, default=10)
         if name == "summary":
             p.add_argument("--include-failed-rows", action="store_true")
+        if name in {"run", "ci"}:
+            p.add_argument("--reuse-csv", action="store_true")
 
     pf = sub.add_parser("failed-rows")
     pf.add_argument("failed_rows_csv", type=Path)
@@ -1,8 +1,16 @@
 #!/usr/bin/env python3
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import Callable, Dict, Iterable, List, Mapping, Sequence, Tuple
+import os
+from dataclasses import dataclass, field
+from operator import itemgetter
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Mapping, Sequence, TextIO, Tuple
+
+# Metrics CSVs are scanned start to finish; read them in large chunks.
+CSV_READ_BUFFER = 1 << 20
+# Failed-rows CSVs are written row by row; flush them in large blocks too.
+CSV_WRITE_BUFFER = 1 << 20
 
 
 @dataclass(frozen=True)
@@ -12,14 +20,16 @@ class MetricSpec:
     strict_transform: Callable[[float], float]
     display_name: str
     fmt: str = "{:.6f}"
+    # Bound ``fmt.format``, so per-cell loops can hoist the lookup.
+    formatter: Callable[[float], str] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        object.__setattr__(self, "formatter", self.fmt.format)
 
     def validate(self) -> None:
         if self.direction not in {"min", "max"}:
             raise ValueError(f"invalid direction for {self.name}: {self.direction}")
 
-    def format_value(self, value: float) -> str:
-        return self.fmt.format(value)
-
 
 def apply_profile_limits(
     baseline: Mapping[Tuple[str, str], Mapping[str, float]],
@@ -40,45 +50,89 @@ def apply_profile_limits(
     return out
 
 
-def summarize_rows(
-    rows: Iterable[Mapping[str, str]],
+def summarize_records(
+    fields: Sequence[str],
+    records: Iterable[Sequence[str]],
     group_keys: Sequence[str],
     metrics: Sequence[MetricSpec],
 ) -> Dict[Tuple[str, ...], Dict[str, float]]:
-    summary: Dict[Tuple[str, ...], Dict[str, float]] = {}
-    for row in rows:
-        key = tuple(row[k] for k in group_keys)
-        if key not in summary:
-            summary[key] = {"rows": 0.0}
-            for spec in metrics:
-                summary[key][spec.name] = 1.0 if spec.direction == "min" else 0.0
-        summary[key]["rows"] += 1.0
-        for spec in metrics:
-            value = float(row[spec.name])
-            if spec.direction == "min":
-                summary[key][spec.name] = min(summary[key][spec.name], value)
-            else:
-                summary[key][spec.name] = max(summary[key][spec.name], value)
-    return summary
+    if not fields:
+        return {}
+    index = {name: i for i, name in enumerate(fields)}
+    key_cols = [index[k] for k in group_keys]
+    metric_cols = [index[spec.name] for spec in metrics]
+    # Rows with a non-numeric metric are reported by the threshold checks, not summarized.
+    groups = (
+        (tuple([record[k] for k in key_cols]), parse_metric_values(record, metric_cols))
+        for record in records
+        if record
+    )
+    return summarize_values(((key, values) for key, values in groups if values is not None), metrics)
+
+
+def parse_metric_values(record: Sequence[str], metric_cols: Sequence[int]) -> List[float] | None:
+    try:
+        return [float(record[col]) for col in metric_cols]
+    except ValueError:
+        return None
+
+
+def non_numeric_metrics(row: Mapping[str, str], metrics: Sequence[MetricSpec]) -> List[str]:
+    bad: List[str] = []
+    for spec in metrics:
+        try:
+            float(row[spec.name])
+        except ValueError:
+            bad.append(spec.name)
+    return bad
 
 
-def evaluate_row_against_limits(
-    row: Mapping[str, str],
-    limits: Mapping[str, float],
+def summarize_values(
+    groups: Iterable[Tuple[Tuple[str, ...], Sequence[float]]],
     metrics: Sequence[MetricSpec],
-    epsilon: float,
-) -> List[str]:
-    violations: List[str] = []
+) -> Dict[Tuple[str, ...], Dict[str, float]]:
+    # Takes (group key, metric values in METRICS order) pairs for callers that
+    # already parsed the floats. Accumulate into flat lists ([rows, metric...])
+    # and only build the per-group dicts once at the end.
+    names = [spec.name for spec in metrics]
+    is_min = [spec.direction == "min" for spec in metrics]
+    initial = [0.0] + [1.0 if m else 0.0 for m in is_min]
+    columns = list(enumerate(is_min, start=1))
+    acc: Dict[Tuple[str, ...], List[float]] = {}
+    for key, row_values in groups:
+        totals = acc.get(key)
+        if totals is None:
+            totals = acc[key] = initial.copy()
+        totals[0] += 1.0
+        for (i, lower), value in zip(columns, row_values):
+            if lower:
+                if value < totals[i]:
+                    totals[i] = value
+            elif value > totals[i]:
+                totals[i] = value
+    return {key: dict(zip(["rows", *names], totals)) for key, totals in acc.items()}
+
+
+def metric_signs(metrics: Sequence[MetricSpec]) -> Tuple[float, ...]:
     for spec in metrics:
-        observed = float(row[spec.name])
-        limit = limits[spec.name]
-        if spec.direction == "min":
-            if observed + epsilon < limit:
-                violations.append(spec.name)
-        else:
-            if observed - epsilon > limit:
-                violations.append(spec.name)
-    return violations
+        spec.validate()
+    return tuple(1.0 if spec.direction == "max" else -1.0 for spec in metrics)
+
+
+def evaluate_row_fast(
+    values: Sequence[float],
+    limits: Sequence[float],
+    signs: Sequence[float],
+    epsilon: float,
+) -> List[int]:
+    # Values and limits are in metric order. A "max" metric fails when
+    # observed - epsilon > limit; negating both sides turns the "min" test
+    # observed + epsilon < limit into the same comparison exactly.
+    return [
+        i
+        for i, (observed, limit, sign) in enumerate(zip(values, limits, signs))
+        if sign * observed - epsilon > sign * limit
+    ]
 
 
 def render_markdown_table(
@@ -105,3 +159,44 @@ def render_markdown_table(
     for row in rows:
         lines.append("| " + " | ".join(row) + " |")
     return lines
+
+
+def column_picker(fields: Sequence[str], columns: Sequence[str]) -> Callable[[Sequence[str]], Sequence[str]]:
+    index = {name: i for i, name in enumerate(fields)}
+    positions = [index.get(col) for col in columns]
+    if len(positions) > 1 and None not in positions:
+        return itemgetter(*positions)
+    return lambda row: [row[i] if i is not None and i < len(row) else "" for i in positions]
+
+
+def write_markdown_table(
+    out: TextIO,
+    headers: Sequence[str],
+    aligns: Sequence[str],
+    rows: Iterable[Sequence[str]],
+) -> None:
+    parts = [f"{line}\n" for line in render_markdown_table(headers, aligns, ())]
+    parts.extend([f"| {' | '.join(row)} |\n" for row in rows])
+    out.write("".join(parts))
+
+
+def write_text_atomic(path: Path, text: str) -> None:
+    # Readers of the summary never see a half-written file.
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    tmp_path.write_text(text, encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
+def example_output_is_fresh(csv_path: Path, example: str) -> bool:
+    # Paths are relative to the crate root, where the report scripts run cargo.
+    if not csv_path.exists():
+        return False
+    # An empty or header-only CSV would evaluate to PASS; always regenerate it.
+    with csv_path.open(encoding="utf-8") as fh:
+        if not fh.readline().strip() or not fh.readline().strip():
+            return False
+    sources = [Path("Cargo.toml"), Path("Cargo.lock"), Path("examples") / f"{example}.rs"]
+    sources.extend(Path("src").rglob("*.rs"))
+    newest = max((p.stat().st_mtime for p in sources if p.exists()), default=None)
+    return newest is not None and csv_path.stat().st_mtime >= newest
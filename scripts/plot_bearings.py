@@ -2,38 +2,120 @@
 """Plot bearings over time from CSV data, comparing correlation and zero-crossing methods."""
 
 import argparse
+import csv
+import importlib.util
+import io
+import os
 import sys
 from pathlib import Path
 
-import numpy as np
-import pandas as pd
-import matplotlib.pyplot as plt
-from matplotlib.gridspec import GridSpec
 
+# Bearings and quality metrics are plotted at screen precision; float32 halves
+# the bytes the masks, point plots and density binning walk through.
+COLUMN_DTYPES = {
+    'bearing': 'float32',
+    'raw': 'float32',
+    'confidence': 'float32',
+    'coherence': 'float32',
+}
 
-def load_and_prepare(source, min_confidence, min_coherence):
-    """Load CSV and prepare dataframe with time column."""
-    if isinstance(source, str) or isinstance(source, Path):
-        df = pd.read_csv(source)
+# The remaining CSV columns are never plotted, so they are not parsed at all.
+# Either 'ts' or a precomputed 'time_s' may carry the time axis.
+PLOT_COLUMNS = ('ts', 'time_s', *COLUMN_DTYPES)
+
+HAVE_PYARROW = importlib.util.find_spec('pyarrow') is not None
+
+# Above this many rows the single-file plot draws binned densities instead of points.
+DENSITY_MIN_POINTS = 200_000
+
+# Quality metrics are logged in 0.01 steps; centre one density bin on each step
+# so float32 rounding cannot leave empty stripes between equal-width bins.
+QUALITY_BINS = 101
+QUALITY_RANGE = (-0.005, 1.005)
+
+
+def read_bearing_csv(source):
+    """Read the plotted columns of a bearing CSV from a path or text stream."""
+    if not HAVE_PYARROW:
+        import pandas as pd
+
+        return pd.read_csv(source, usecols=lambda col: col in PLOT_COLUMNS, dtype=COLUMN_DTYPES)
+
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+
+    # include_columns must name existing columns, so project from the header.
+    if hasattr(source, 'buffer'):
+        source = io.BytesIO(source.buffer.read())
+        first_line = source.getvalue().split(b'\n', 1)[0]
     else:
-        df = pd.read_csv(source)
+        with open(source, 'rb') as fh:
+            first_line = fh.readline()
+    header = next(csv.reader([first_line.decode('utf-8-sig').rstrip('\r\n')]), [])
+    table = pacsv.read_csv(source, convert_options=pacsv.ConvertOptions(
+        include_columns=[col for col in PLOT_COLUMNS if col in header],
+        column_types={col: pa.float32() for col in COLUMN_DTYPES}))
+    return table.to_pandas(self_destruct=True)
+
+
+def load_and_prepare(source, min_confidence, min_coherence):
+    """Load CSV, add a time column and return it with the indices of rows passing the filters."""
+    import numpy as np
+    import pandas as pd
+
+    df = read_bearing_csv(source)
 
     if len(df) == 0:
         df['time_s'] = pd.Series(dtype=float)
-        return df, df
+        return df, np.empty(0, dtype=np.intp)
 
     if 'ts' in df.columns:
-        df['ts'] = pd.to_datetime(df['ts'])
-        df['time_s'] = (df['ts'] - df['ts'].iloc[0]).dt.total_seconds()
+        ts = pd.to_datetime(df['ts'], format='ISO8601', cache=True)
+        ns = ts.to_numpy('datetime64[ns]').view('i8')
+        df['time_s'] = (ns - ns[0]) * 1e-9
+
+    mask = np.greater_equal(df['confidence'].to_numpy(), min_confidence)
+    mask &= np.greater_equal(df['coherence'].to_numpy(), min_coherence)
+    return df, np.flatnonzero(mask)
 
-    mask = (df['confidence'] >= min_confidence) & (df['coherence'] >= min_coherence)
-    return df, df[mask]
 
+def filtered_columns(df, idx, columns):
+    """Gather only the requested columns for the filtered rows."""
+    return {col: df[col].to_numpy()[idx] for col in columns}
 
-def circular_diff(a, b):
+
+def circular_diff(a, b, out=None):
     """Compute circular difference between bearings, result in [-180, 180]."""
-    diff = a - b
-    return ((diff + 180) % 360) - 180
+    import numpy as np
+
+    if out is None:
+        out = np.empty(np.shape(a), dtype=np.float32)
+    np.subtract(a, b, out=out)
+    np.add(out, 180, out=out)
+    np.mod(out, 360, out=out)
+    np.subtract(out, 180, out=out)
+    return out
+
+
+def density_image(ax, x, y, x_range, y_range, cmap, bins=(100, 36), alpha=None):
+    """Draw a 2-D point density as an image, leaving empty bins blank."""
+    import numpy as np
+
+    counts, _, _ = np.histogram2d(
+        np.asarray(x, dtype=np.float32), np.asarray(y, dtype=np.float32),
+        bins=bins, range=[x_range, y_range])
+    ax.imshow(np.ma.masked_less(counts, 1).T, origin='lower', aspect='auto',
+              extent=[*x_range, *y_range], cmap=cmap, interpolation='nearest',
+              alpha=alpha)
+
+
+def density_legend(ax, entries):
+    """Legend for density images, one swatch per (colormap, label) pair."""
+    from matplotlib import colormaps
+    from matplotlib.patches import Patch
+
+    ax.legend(handles=[Patch(color=colormaps[cmap](0.7), label=label) for cmap, label in entries],
+              loc='upper right')
 
 
 def main():
@@ -63,40 +145,82 @@ def main():
         plot_single(args)
 
 
+def has_display():
+    """Whether an interactive backend has somewhere to open a window."""
+    return (os.name == 'nt' or sys.platform == 'darwin'
+            or bool(os.environ.get('DISPLAY') or os.environ.get('WAYLAND_DISPLAY')))
+
+
+def import_pyplot(no_show):
+    """Import pyplot, on the non-interactive Agg backend when nothing will be shown."""
+    import matplotlib
+
+    if (no_show or not has_display()) and 'MPLBACKEND' not in os.environ:
+        matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    return plt
+
+
 def plot_single(args):
     """Original single-file plotting mode."""
+    plt = import_pyplot(args.no_show)
+
+    plt.rcParams['agg.path.chunksize'] = 10000
+
     if args.csv_file:
-        df, df_filtered = load_and_prepare(
+        df, idx = load_and_prepare(
             args.csv_file, args.min_confidence, args.min_coherence)
     else:
-        df, df_filtered = load_and_prepare(
+        df, idx = load_and_prepare(
             sys.stdin, args.min_confidence, args.min_coherence)
+    df_filtered = filtered_columns(df, idx, ('time_s', 'bearing', 'raw'))
 
-    print(f"Plotting {len(df_filtered)}/{len(df)} points "
+    print(f"Plotting {idx.size}/{len(df)} points "
           f"(confidence >= {args.min_confidence}, coherence >= {args.min_coherence})")
 
-    fig, axes = plt.subplots(2, 1, figsize=(12, 8), sharex=True)
+    fig, axes = plt.subplots(2, 1, figsize=(12, 8), sharex=True, layout='constrained')
 
     ax1 = axes[0]
-    ax1.scatter(df_filtered['time_s'], df_filtered['bearing'], s=1, alpha=0.5, label='Smoothed')
-    ax1.scatter(df_filtered['time_s'], df_filtered['raw'], s=1, alpha=0.3, label='Raw')
+    ax2 = axes[1]
+    if len(df) > DENSITY_MIN_POINTS:
+        # Past this size individual dots merge anyway; bin them so render cost
+        # follows the grid size rather than the row count.
+        time_range = (0, max(1, df['time_s'].max()))
+        density_image(ax1, df_filtered['time_s'], df_filtered['bearing'],
+                      time_range, (0, 360), 'Blues', bins=(1000, 180))
+        density_image(ax1, df_filtered['time_s'], df_filtered['raw'],
+                      time_range, (0, 360), 'Oranges', bins=(1000, 180), alpha=0.5)
+        density_image(ax2, df['time_s'], df['confidence'],
+                      time_range, QUALITY_RANGE, 'Blues', bins=(1000, QUALITY_BINS))
+        density_image(ax2, df['time_s'], df['coherence'],
+                      time_range, QUALITY_RANGE, 'Oranges', bins=(1000, QUALITY_BINS), alpha=0.5)
+        density_legend(ax1, (('Blues', 'Smoothed'), ('Oranges', 'Raw')))
+        ax1.set_title('Bearing Over Time')
+        density_legend(ax2, (('Blues', 'Confidence'), ('Oranges', 'Coherence')))
+    else:
+        ax1.plot(df_filtered['time_s'], df_filtered['bearing'], '.', markersize=1,
+                 alpha=0.5, label='Smoothed', rasterized=True)
+        ax1.plot(df_filtered['time_s'], df_filtered['raw'], '.', markersize=1,
+                 alpha=0.3, label='Raw', rasterized=True)
+        ax1.legend(loc='upper right')
+        ax1.set_title('Bearing Over Time')
+        ax2.plot(df['time_s'], df['confidence'], '.', markersize=1,
+                 alpha=0.5, label='Confidence', rasterized=True)
+        ax2.plot(df['time_s'], df['coherence'], '.', markersize=1,
+                 alpha=0.5, label='Coherence', rasterized=True)
+        ax2.legend(loc='upper right')
+
     ax1.set_ylabel('Bearing (degrees)')
     ax1.set_ylim(0, 360)
     ax1.set_yticks([0, 90, 180, 270, 360])
-    ax1.legend(loc='upper right')
     ax1.grid(True, alpha=0.3)
-    ax1.set_title('Bearing Over Time')
 
-    ax2 = axes[1]
-    ax2.scatter(df['time_s'], df['confidence'], s=1, alpha=0.5, label='Confidence')
-    ax2.scatter(df['time_s'], df['coherence'], s=1, alpha=0.5, label='Coherence')
     ax2.set_xlabel('Time (seconds)')
     ax2.set_ylabel('Quality Metric')
     ax2.set_ylim(0, 1)
-    ax2.legend(loc='upper right')
     ax2.grid(True, alpha=0.3)
 
-    plt.tight_layout()
     if args.output:
         output_path = Path(args.output)
     elif args.csv_file:
@@ -106,33 +230,40 @@ def plot_single(args):
         output_path = Path("/tmp/bearings_plot.png")
     plt.savefig(output_path, dpi=150)
     print(f"Saved plot to {output_path}")
-    if not args.no_show:
+    if not args.no_show and has_display():
         plt.show()
 
 
 def plot_comparison(args):
-    """Plot correlation and zero-crossing methods with hexbin density and difference."""
+    """Plot correlation and zero-crossing methods with binned density and difference."""
+    import numpy as np
+    import pandas as pd
 
-    df_corr = df_corr_f = None
-    df_zc = df_zc_f = None
+    plt = import_pyplot(args.no_show)
+    from matplotlib.gridspec import GridSpec
+
+    df_corr_f = None
+    df_zc_f = None
 
     if args.correlation:
-        df_corr, df_corr_f = load_and_prepare(
+        df_corr, idx = load_and_prepare(
             args.correlation, args.min_confidence, args.min_coherence)
         if len(df_corr) == 0:
             print("Correlation: no data")
-            df_corr = df_corr_f = None
         else:
-            print(f"Correlation: {len(df_corr_f)}/{len(df_corr)} points after filtering")
+            print(f"Correlation: {idx.size}/{len(df_corr)} points after filtering")
+            df_corr_f = pd.DataFrame(filtered_columns(df_corr, idx, ('time_s', 'bearing')))
+        del df_corr
 
     if args.zero_crossing:
-        df_zc, df_zc_f = load_and_prepare(
+        df_zc, idx = load_and_prepare(
             args.zero_crossing, args.min_confidence, args.min_coherence)
         if len(df_zc) == 0:
             print("Zero-crossing: no data")
-            df_zc = df_zc_f = None
         else:
-            print(f"Zero-crossing: {len(df_zc_f)}/{len(df_zc)} points after filtering")
+            print(f"Zero-crossing: {idx.size}/{len(df_zc)} points after filtering")
+            df_zc_f = pd.DataFrame(filtered_columns(df_zc, idx, ('time_s', 'bearing')))
+        del df_zc
 
     # Create figure with custom grid layout
     fig = plt.figure(figsize=(14, 12))
@@ -153,8 +284,8 @@ def plot_comparison(args):
     ax_corr_hist = fig.add_subplot(gs[0, 2], sharey=ax_corr)
 
     if df_corr_f is not None and len(df_corr_f) > 0:
-        hb = ax_corr.hexbin(df_corr_f['time_s'], df_corr_f['bearing'],
-                           gridsize=(100, 36), cmap='Blues', mincnt=1)
+        density_image(ax_corr, df_corr_f['time_s'], df_corr_f['bearing'],
+                      (time_min, time_max), (0, 360), 'Blues')
         ax_corr_hist.hist(df_corr_f['bearing'], bins=72, range=(0, 360),
                          orientation='horizontal', color='tab:blue', alpha=0.7)
     ax_corr.set_ylabel('Bearing (degrees)')
@@ -171,8 +302,8 @@ def plot_comparison(args):
     ax_zc_hist = fig.add_subplot(gs[1, 2], sharey=ax_zc)
 
     if df_zc_f is not None and len(df_zc_f) > 0:
-        hb = ax_zc.hexbin(df_zc_f['time_s'], df_zc_f['bearing'],
-                         gridsize=(100, 36), cmap='Oranges', mincnt=1)
+        density_image(ax_zc, df_zc_f['time_s'], df_zc_f['bearing'],
+                      (time_min, time_max), (0, 360), 'Oranges')
         ax_zc_hist.hist(df_zc_f['bearing'], bins=72, range=(0, 360),
                        orientation='horizontal', color='tab:orange', alpha=0.7)
     ax_zc.set_ylabel('Bearing (degrees)')
@@ -189,21 +320,20 @@ def plot_comparison(args):
 
     if df_corr_f is not None and df_zc_f is not None and len(df_corr_f) > 0 and len(df_zc_f) > 0:
         # Merge on nearest timestamp
-        df_corr_f = df_corr_f.copy()
-        df_zc_f = df_zc_f.copy()
-        df_corr_f['time_bin'] = (df_corr_f['time_s'] * 100).round() / 100
-        df_zc_f['time_bin'] = (df_zc_f['time_s'] * 100).round() / 100
-
-        merged = pd.merge(df_corr_f[['time_bin', 'bearing']],
-                         df_zc_f[['time_bin', 'bearing']],
-                         on='time_bin', suffixes=('_corr', '_zc'))
+        merged = pd.merge_asof(
+            df_corr_f.sort_values('time_s'),
+            df_zc_f.sort_values('time_s'),
+            on='time_s', suffixes=('_corr', '_zc'),
+            direction='nearest', tolerance=0.01).dropna(subset=['bearing_zc'])
 
         if len(merged) > 0:
-            merged['diff'] = circular_diff(merged['bearing_corr'], merged['bearing_zc'])
+            merged['diff'] = circular_diff(
+                merged['bearing_corr'].to_numpy(np.float32, copy=False),
+                merged['bearing_zc'].to_numpy(np.float32, copy=False),
+                out=np.empty(len(merged), dtype=np.float32))
 
-            ax_diff.hexbin(merged['time_bin'], merged['diff'],
-                          gridsize=(100, 36), cmap='RdBu_r', mincnt=1,
-                          extent=[time_min, time_max, -180, 180])
+            density_image(ax_diff, merged['time_s'], merged['diff'],
+                          (time_min, time_max), (-180, 180), 'RdBu_r')
             ax_diff.axhline(y=0, color='black', linestyle='-', linewidth=0.5)
 
             ax_diff_hist.hist(merged['diff'], bins=72, range=(-180, 180),
@@ -234,7 +364,7 @@ def plot_comparison(args):
 
     plt.savefig(output_path, dpi=150, bbox_inches='tight')
     print(f"Saved plot to {output_path}")
-    if not args.no_show:
+    if not args.no_show and has_display():
         plt.show()
 
 
@@ -9,11 +9,20 @@ Usage:
     cargo run --release --bin noise_analysis --features test-utils | python scripts/plot_noise_degradation.py
 """
 
+import os
 import sys
 import csv
-import matplotlib.pyplot as plt
 from collections import defaultdict
 
+# (series key, CSV column) pairs for the numeric fields of each row.
+VALUE_COLUMNS = (
+    ("param", "parameter"),
+    ("zc_mean", "zc_mean"),
+    ("zc_std", "zc_std"),
+    ("corr_mean", "corr_mean"),
+    ("corr_std", "corr_std"),
+)
+
 
 def parse_csv(input_stream):
     """Parse CSV data into a dictionary grouped by noise type."""
@@ -27,14 +36,19 @@ def parse_csv(input_stream):
         }
     )
 
-    reader = csv.DictReader(input_stream)
+    reader = csv.reader(input_stream)
+    header = next(reader, None)
+    if header is None:
+        return data
+    index = {name: i for i, name in enumerate(header)}
+    type_col = index["noise_type"]
+    value_cols = [(key, index[name]) for key, name in VALUE_COLUMNS]
     for row in reader:
-        noise_type = row["noise_type"]
-        data[noise_type]["param"].append(float(row["parameter"]))
-        data[noise_type]["zc_mean"].append(float(row["zc_mean"]))
-        data[noise_type]["zc_std"].append(float(row["zc_std"]))
-        data[noise_type]["corr_mean"].append(float(row["corr_mean"]))
-        data[noise_type]["corr_std"].append(float(row["corr_std"]))
+        if not row:
+            continue
+        series = data[row[type_col]]
+        for key, col in value_cols:
+            series[key].append(float(row[col]))
 
     return data
 
@@ -62,7 +76,16 @@ def plot_panel(ax, params, zc_mean, zc_std, corr_mean, corr_std, title, xlabel,
 def main():
     data = parse_csv(sys.stdin)
 
-    fig, axes = plt.subplots(2, 2, figsize=(12, 10))
+    import matplotlib
+
+    # Without a display only the PNG is wanted; skip the GUI backend.
+    show = (os.name == "nt" or sys.platform == "darwin"
+            or bool(os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY")))
+    if not show and "MPLBACKEND" not in os.environ:
+        matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    fig, axes = plt.subplots(2, 2, figsize=(12, 10), layout="constrained")
     fig.suptitle("RDF Bearing Estimation: Noise Degradation Analysis (N=10 trials)", fontsize=14)
 
     if "awgn" in data:
@@ -114,10 +137,10 @@ def main():
             "Impulse Rate (Hz)",
         )
 
-    plt.tight_layout()
     plt.savefig("noise_degradation.png", dpi=150)
     print("Saved plot to noise_degradation.png", file=sys.stderr)
-    plt.show()
+    if show:
+        plt.show()
 
 
 if __name__ == "__main__":
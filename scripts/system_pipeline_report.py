@@ -3,16 +3,26 @@ from __future__ import annotations
 
 import argparse
 import csv
+import io
+import itertools
 import subprocess
+import sys
+from operator import itemgetter
 from pathlib import Path
-from typing import Dict, Tuple
+from typing import Dict, Iterable, Mapping, Sequence, TextIO, Tuple
 
 from perf_schema import (
+    CSV_READ_BUFFER,
+    CSV_WRITE_BUFFER,
     MetricSpec,
     apply_profile_limits,
-    evaluate_row_against_limits,
-    render_markdown_table,
-    summarize_rows,
+    column_picker,
+    evaluate_row_fast,
+    metric_signs,
+    non_numeric_metrics,
+    parse_metric_values,
+    summarize_records,
+    write_markdown_table,
 )
 
 EPSILON = 1e-6
@@ -163,6 +173,30 @@ BASELINE_LIMITS[("simple", "zero_crossing", "low_snr_dc")].update(
     }
 )
 
+SORTED_BASELINE_KEYS = tuple(sorted(BASELINE_LIMITS))
+
+PROFILE_LIMITS: Dict[str, Dict[Tuple[str, str, str], Dict[str, float]]] = {
+    profile: apply_profile_limits(BASELINE_LIMITS, METRICS, profile) for profile in ("baseline", "strict")
+}
+
+METRIC_NAMES = tuple(m.name for m in METRICS)
+METRIC_FORMATTERS = tuple((m.name, m.formatter) for m in METRICS)
+METRIC_SIGNS = metric_signs(METRICS)
+LIMIT_FIELDS = tuple(f"limit_{name}" for name in METRIC_NAMES)
+EMPTY_LIMITS = ("",) * len(LIMIT_FIELDS)
+FAILED_ROWS_MD_COLUMNS = (
+    ("north_mode", "bearing_method", "scenario", "buffer_size") + METRIC_NAMES + LIMIT_FIELDS + ("reason",)
+)
+
+
+def limit_vectors_for(
+    limits_by_key: Mapping[Tuple[str, str, str], Mapping[str, float]],
+) -> Dict[Tuple[str, str, str], Tuple[float, ...]]:
+    return {key: tuple(limits[name] for name in METRIC_NAMES) for key, limits in limits_by_key.items()}
+
+
+PROFILE_LIMIT_VECTORS = {profile: limit_vectors_for(limits) for profile, limits in PROFILE_LIMITS.items()}
+
 
 def paths(out_dir: Path, profile: str) -> tuple[Path, Path, Path]:
     return (
@@ -183,131 +217,148 @@ def run_example(csv_path: Path) -> None:
 
 
 def evaluate_thresholds(
-    rows: list[dict[str, str]],
+    fields: Sequence[str],
+    records: Iterable[Sequence[str]],
     profile: str,
     overrides: dict[str, float | None],
-) -> tuple[list[str], list[dict[str, str]]]:
-    profile_limits = apply_profile_limits(BASELINE_LIMITS, METRICS, profile)
+) -> tuple[list[str], list[tuple[str, ...]]]:
+    if not fields:
+        return [], []
+    profile_limits = PROFILE_LIMITS[profile]
+    active_overrides = {name: float(value) for name, value in overrides.items() if value is not None}
+    if active_overrides:
+        limits_by_key = {key: {**limits, **active_overrides} for key, limits in profile_limits.items()}
+        limit_vectors = limit_vectors_for(limits_by_key)
+    else:
+        limits_by_key = profile_limits
+        limit_vectors = PROFILE_LIMIT_VECTORS[profile]
+    index = {name: i for i, name in enumerate(fields)}
+    key_cols = itemgetter(index["north_mode"], index["bearing_method"], index["scenario"])
+    metric_cols = [index[name] for name in METRIC_NAMES]
     failures: list[str] = []
-    failed_rows: list[dict[str, str]] = []
+    failed_rows: list[tuple[str, ...]] = []
 
-    for row in rows:
-        key = (row["north_mode"], row["bearing_method"], row["scenario"])
-        if key not in BASELINE_LIMITS:
-            failures.append(f"FAIL unknown key row: {row}")
-            failed_rows.append(
-                {
-                    **row,
-                    **{f"limit_{m.name}": "" for m in METRICS},
-                    "reason": "unknown north_mode/bearing_method/scenario",
-                }
-            )
+    for record in records:
+        if not record:
+            continue
+        key = key_cols(record)
+        limit_vector = limit_vectors.get(key)
+        if limit_vector is None:
+            failures.append(f"FAIL unknown key row: {dict(zip(fields, record))}")
+            failed_rows.append((*record, *EMPTY_LIMITS, "unknown north_mode/bearing_method/scenario"))
             continue
 
-        limits = dict(profile_limits[key])
-        for metric_name, value in overrides.items():
-            if value is not None:
-                limits[metric_name] = float(value)
+        values = parse_metric_values(record, metric_cols)
+        if values is None:
+            row = dict(zip(fields, record))
+            columns = ",".join(non_numeric_metrics(row, METRICS))
+            failures.append(f"FAIL non-numeric metric row: {row} (columns={columns})")
+            failed_rows.append((*record, *EMPTY_LIMITS, f"non-numeric metric: {columns}"))
+            continue
 
-        violations = evaluate_row_against_limits(row, limits, METRICS, EPSILON)
-        if violations:
-            observed = " ".join(f"{m.name}={m.format_value(float(row[m.name]))}" for m in METRICS)
-            limits_text = " ".join(f"limit_{m.name}={m.format_value(limits[m.name])}" for m in METRICS)
+        violated = evaluate_row_fast(values, limit_vector, METRIC_SIGNS, EPSILON)
+        if violated:
+            limits = limits_by_key[key]
+            violations = [METRIC_NAMES[i] for i in violated]
+            observed = " ".join([f"{name}={fmt(v)}" for (name, fmt), v in zip(METRIC_FORMATTERS, values)])
+            limits_text = " ".join([f"limit_{name}={fmt(limits[name])}" for name, fmt in METRIC_FORMATTERS])
             failures.append(
-                f"FAIL row: {row} ({observed}; {limits_text}; violations={','.join(violations)})"
+                f"FAIL row: {dict(zip(fields, record))} ({observed}; {limits_text}; violations={','.join(violations)})"
             )
             failed_rows.append(
-                {
-                    **row,
-                    **{f"limit_{m.name}": m.format_value(limits[m.name]) for m in METRICS},
-                    "reason": "threshold exceeded",
-                }
+                (*record, *(fmt(limits[name]) for name, fmt in METRIC_FORMATTERS), "threshold exceeded")
             )
 
     return failures, failed_rows
 
 
-def write_failed_rows_csv(rows: list[dict[str, str]], failed_rows_path: Path, input_rows: list[dict[str, str]]) -> None:
+def write_failed_rows_csv(rows: list[tuple[str, ...]], failed_rows_path: Path, input_fields: Sequence[str]) -> None:
     failed_rows_path.parent.mkdir(parents=True, exist_ok=True)
-    input_fields = list(input_rows[0].keys()) if input_rows else []
-    limit_fields = [f"limit_{m.name}" for m in METRICS]
-    fieldnames = input_fields + limit_fields + ["reason"]
-    with failed_rows_path.open("w", newline="", encoding="utf-8") as fh:
-        writer = csv.DictWriter(fh, fieldnames=fieldnames)
-        writer.writeheader()
-        for row in rows:
-            writer.writerow(row)
-
-
-def build_summary_lines(rows: list[dict[str, str]], profile: str) -> list[str]:
-    grouped = summarize_rows(rows, group_keys=["north_mode", "bearing_method", "scenario"], metrics=METRICS)
-    profile_limits = apply_profile_limits(BASELINE_LIMITS, METRICS, profile)
-
-    lines = [
-        "# System Pipeline Performance Summary",
-        "",
-        f"- Profile: `{profile}`",
-        "- Scope: full stack (north tracking + bearing calculation).",
-        "- This markdown file is the detailed metrics artifact generated from CSV.",
-        "- CI step-summary status notes are separate and only indicate pass/fail state.",
-        "",
-        "## Threshold Profile",
-        "",
-    ]
+    with failed_rows_path.open("w", newline="", encoding="utf-8", buffering=CSV_WRITE_BUFFER) as fh:
+        writer = csv.writer(fh)
+        writer.writerow(failed_rows_fields(input_fields))
+        writer.writerows(rows)
+
+
+def read_metrics_csv(csv_path: Path) -> tuple[list[str], list[list[str]]]:
+    with csv_path.open(newline="", encoding="utf-8", buffering=CSV_READ_BUFFER) as fh:
+        reader = csv.reader(fh)
+        fields = next(reader, [])
+        return fields, list(reader)
+
+
+def build_summary(fields: Sequence[str], records: Iterable[Sequence[str]], profile: str) -> io.StringIO:
+    grouped = summarize_records(fields, records, group_keys=["north_mode", "bearing_method", "scenario"], metrics=METRICS)
+    profile_limits = PROFILE_LIMITS[profile]
+
+    out = io.StringIO()
+    w = out.write
+    w("# System Pipeline Performance Summary\n")
+    w("\n")
+    w(f"- Profile: `{profile}`\n")
+    w("- Scope: full stack (north tracking + bearing calculation).\n")
+    w("- This markdown file is the detailed metrics artifact generated from CSV.\n")
+    w("- CI step-summary status notes are separate and only indicate pass/fail state.\n")
+    w("\n")
+    w("## Threshold Profile\n")
+    w("\n")
     if profile == "baseline":
-        lines.extend(["Using baseline thresholds.", ""])
+        w("Using baseline thresholds.\n\n")
     else:
-        lines.extend(
-            [
-                "Using strict thresholds derived from metric transforms:",
-                "",
-                "- `bearing_success_rate + 0.001`",
-                "- `detection_rate + 0.001`",
-                "- `false_positive_rate - 0.001`",
-                "- `*_us_per_sample * 0.98`",
-                "- `mean/p95 bearing_error * 0.98`",
-                "- `max_abs_bearing_error_deg unchanged`",
-                "- `*_tick_error_samples * 0.98`",
-                "",
-            ]
+        w(
+            "Using strict thresholds derived from metric transforms:\n"
+            "\n"
+            "- `bearing_success_rate + 0.001`\n"
+            "- `detection_rate + 0.001`\n"
+            "- `false_positive_rate - 0.001`\n"
+            "- `*_us_per_sample * 0.98`\n"
+            "- `mean/p95 bearing_error * 0.98`\n"
+            "- `max_abs_bearing_error_deg unchanged`\n"
+            "- `*_tick_error_samples * 0.98`\n"
+            "\n"
         )
 
     threshold_headers = ["north", "bearing", "scenario", "threshold set"] + [f"limit {m.display_name}" for m in METRICS]
     threshold_aligns = ["left", "left", "left", "left"] + ["right"] * len(METRICS)
     threshold_rows = []
-    for north_mode, bearing_method, scenario in sorted(BASELINE_LIMITS.keys()):
+    for north_mode, bearing_method, scenario in SORTED_BASELINE_KEYS:
         lim = profile_limits[(north_mode, bearing_method, scenario)]
         threshold_rows.append(
             [north_mode, bearing_method, scenario, f"{north_mode}_{bearing_method}_{scenario}_{profile}"]
-            + [m.format_value(lim[m.name]) for m in METRICS]
+            + [fmt(lim[name]) for name, fmt in METRIC_FORMATTERS]
         )
-    lines.extend(render_markdown_table(threshold_headers, threshold_aligns, threshold_rows))
+    write_markdown_table(out, threshold_headers, threshold_aligns, threshold_rows)
 
-    lines.extend(["", "## Metrics", ""])
+    w("\n## Metrics\n\n")
     metric_headers = ["north", "bearing", "scenario", "rows"] + [m.display_name for m in METRICS]
     metric_aligns = ["left", "left", "left", "right"] + ["right"] * len(METRICS)
-    metric_rows = []
-    for north_mode, bearing_method, scenario in sorted(grouped.keys()):
-        s = grouped[(north_mode, bearing_method, scenario)]
-        metric_rows.append(
-            [north_mode, bearing_method, scenario, str(int(s["rows"]))]
-            + [m.format_value(s[m.name]) for m in METRICS]
-        )
-    lines.extend(render_markdown_table(metric_headers, metric_aligns, metric_rows))
-    return lines
+    write_markdown_table(
+        out,
+        metric_headers,
+        metric_aligns,
+        (
+            (*key, str(int(s["rows"])), *(fmt(s[name]) for name, fmt in METRIC_FORMATTERS))
+            for key, s in sorted(grouped.items())
+        ),
+    )
+    return out
 
 
-def append_failed_rows_md(lines: list[str], failed_rows_path: Path, max_rows: int) -> list[str]:
-    lines.extend(["", "## Threshold Check", ""])
-    if not failed_rows_path.exists():
-        lines.append(f"`{failed_rows_path}` not found.")
-        return lines
-    rows = list(csv.DictReader(failed_rows_path.open(newline="", encoding="utf-8")))
-    if not rows:
-        lines.append("No threshold failures.")
-        return lines
-    lines.append(f"Threshold failures: {len(rows)} row(s)")
-    lines.append("")
+def failed_rows_fields(input_fields: Sequence[str]) -> list[str]:
+    return [*input_fields, *LIMIT_FIELDS, "reason"]
+
+
+def write_failed_rows_md(
+    out: TextIO,
+    fields: Sequence[str],
+    rows: Sequence[Sequence[str]],
+    total: int,
+    max_rows: int,
+) -> None:
+    if total == 0:
+        out.write("No threshold failures.\n")
+        return
+    out.write(f"Threshold failures: {total} row(s)\n\n")
     headers = (
         ["north", "bearing", "scenario", "buffer"]
         + [m.display_name for m in METRICS]
@@ -315,38 +366,53 @@ def append_failed_rows_md(lines: list[str], failed_rows_path: Path, max_rows: in
         + ["reason"]
     )
     aligns = ["left", "left", "left", "right"] + ["right"] * (len(METRICS) * 2) + ["left"]
-    table_rows = []
-    for row in rows[:max_rows]:
-        table_rows.append(
-            [
-                row.get("north_mode", ""),
-                row.get("bearing_method", ""),
-                row.get("scenario", ""),
-                row.get("buffer_size", ""),
-                *[row.get(m.name, "") for m in METRICS],
-                *[row.get(f"limit_{m.name}", "") for m in METRICS],
-                row.get("reason", ""),
-            ]
-        )
-    lines.extend(render_markdown_table(headers, aligns, table_rows))
-    if len(rows) > max_rows:
-        lines.extend(["", f"Showing first {max_rows} rows."])
-    return lines
+    pick = column_picker(fields, FAILED_ROWS_MD_COLUMNS)
+    write_markdown_table(out, headers, aligns, map(pick, rows[:max_rows]))
+    if total > max_rows:
+        out.write(f"\nShowing first {max_rows} rows.\n")
 
 
-def write_summary(csv_path: Path, summary_path: Path, profile: str, failed_rows_path: Path | None, max_rows: int) -> None:
-    rows = list(csv.DictReader(csv_path.open(newline="", encoding="utf-8")))
-    lines = build_summary_lines(rows, profile)
-    if failed_rows_path is not None:
-        lines = append_failed_rows_md(lines, failed_rows_path, max_rows)
+def append_failed_rows_md(out: TextIO, failed_rows_path: Path, max_rows: int) -> None:
+    out.write("\n## Threshold Check\n\n")
+    if not failed_rows_path.exists():
+        out.write(f"`{failed_rows_path}` not found.\n")
+        return
+    with failed_rows_path.open(newline="", encoding="utf-8") as fh:
+        reader = csv.reader(fh)
+        fields = next(reader, [])
+        records = (row for row in reader if row)
+        rows = list(itertools.islice(records, max_rows))
+        total = len(rows) + sum(1 for _ in records)
+    write_failed_rows_md(out, fields, rows, total, max_rows)
+
+
+def write_summary(
+    csv_path: Path,
+    summary_path: Path,
+    profile: str,
+    failed_rows_path: Path | None,
+    max_rows: int,
+    metrics_rows: tuple[list[str], list[list[str]]] | None = None,
+    failed_rows: tuple[Sequence[str], list[tuple[str, ...]]] | None = None,
+) -> None:
+    if metrics_rows is None:
+        metrics_rows = read_metrics_csv(csv_path)
+    out = build_summary(*metrics_rows, profile)
+    if failed_rows is not None:
+        fields, failed = failed_rows
+        out.write("\n## Threshold Check\n\n")
+        write_failed_rows_md(out, fields, failed, len(failed), max_rows)
+    elif failed_rows_path is not None:
+        append_failed_rows_md(out, failed_rows_path, max_rows)
     summary_path.parent.mkdir(parents=True, exist_ok=True)
-    summary_path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    summary_path.write_text(out.getvalue(), encoding="utf-8")
 
 
 def print_failed_rows_md(failed_rows_path: Path, title: str, max_rows: int) -> None:
-    lines = [f"## {title}", ""]
-    append_failed_rows_md(lines, failed_rows_path, max_rows)
-    print("\n".join(lines))
+    out = io.StringIO()
+    out.write(f"## {title}\n\n")
+    append_failed_rows_md(out, failed_rows_path, max_rows)
+    sys.stdout.write(out.getvalue())
 
 
 def cmd_run(args: argparse.Namespace) -> int:
@@ -359,7 +425,7 @@ def cmd_run(args: argparse.Namespace) -> int:
 
 def cmd_check(args: argparse.Namespace) -> int:
     csv_path, _, failed_rows_path = paths(args.out_dir, args.profile)
-    rows = list(csv.DictReader(csv_path.open(newline="", encoding="utf-8")))
+    input_fields, rows = read_metrics_csv(csv_path)
     overrides = {
         "bearing_success_rate": args.override_min_bearing_success,
         "detection_rate": args.override_min_detection_rate,
@@ -372,8 +438,8 @@ def cmd_check(args: argparse.Namespace) -> int:
         "mean_abs_tick_error_samples": args.override_max_mean_tick_error_samples,
         "p95_abs_tick_error_samples": args.override_max_p95_tick_error_samples,
     }
-    failures, failed_rows = evaluate_thresholds(rows, args.profile, overrides)
-    write_failed_rows_csv(failed_rows, failed_rows_path, rows)
+    failures, failed_rows = evaluate_thresholds(input_fields, rows, args.profile, overrides)
+    write_failed_rows_csv(failed_rows, failed_rows_path, input_fields)
     print(f"Wrote {failed_rows_path}")
     if failures:
         for failure in failures:
@@ -402,7 +468,7 @@ def cmd_ci(args: argparse.Namespace) -> int:
     run_example(csv_path)
     print(f"Wrote {csv_path}")
 
-    rows = list(csv.DictReader(csv_path.open(newline="", encoding="utf-8")))
+    input_fields, rows = read_metrics_csv(csv_path)
     overrides = {
         "bearing_success_rate": args.override_min_bearing_success,
         "detection_rate": args.override_min_detection_rate,
@@ -415,11 +481,19 @@ def cmd_ci(args: argparse.Namespace) -> int:
         "mean_abs_tick_error_samples": args.override_max_mean_tick_error_samples,
         "p95_abs_tick_error_samples": args.override_max_p95_tick_error_samples,
     }
-    failures, failed_rows = evaluate_thresholds(rows, args.profile, overrides)
-    write_failed_rows_csv(failed_rows, failed_rows_path, rows)
+    failures, failed_rows = evaluate_thresholds(input_fields, rows, args.profile, overrides)
+    write_failed_rows_csv(failed_rows, failed_rows_path, input_fields)
     print(f"Wrote {failed_rows_path}")
 
-    write_summary(csv_path, summary_path, args.profile, failed_rows_path, args.max_rows)
+    write_summary(
+        csv_path,
+        summary_path,
+        args.profile,
+        failed_rows_path,
+        args.max_rows,
+        (input_fields, rows),
+        (failed_rows_fields(input_fields), failed_rows),
+    )
     print(f"Wrote {summary_path}")
 
     if failures:
@@ -1,7 +1,10 @@
 use clap::Parser;
 use rolling_stats::Stats;
 use serde::Serialize;
+use std::cell::RefCell;
+use std::io::{BufWriter, Write};
 use std::path::PathBuf;
+use std::sync::atomic::{AtomicUsize, Ordering};
 
 use rotaryclub::audio::{AudioSource, WavFileSource};
 use rotaryclub::config::{
@@ -150,6 +153,10 @@ struct TrimmedRange {
     dropout_positions: Vec<f32>,
 }
 
+thread_local! {
+    static CURRENT_FILE: RefCell<Option<PathBuf>> = const { RefCell::new(None) };
+}
+
 fn main() -> anyhow::Result<()> {
     let args = Args::parse();
 
@@ -159,7 +166,25 @@ fn main() -> anyhow::Result<()> {
         2 => "debug",
         _ => "trace",
     };
-    env_logger::Builder::from_env(env_logger::Env::default().default_filter_or(log_level)).init();
+    // Files are analyzed concurrently, so tag each log line with its input.
+    env_logger::Builder::from_env(env_logger::Env::default().default_filter_or(log_level))
+        .format(|buf, record| {
+            let file = CURRENT_FILE.with_borrow(|file| {
+                file.as_ref()
+                    .map(|path| format!("{}: ", path.display()))
+                    .unwrap_or_default()
+            });
+            writeln!(
+                buf,
+                "[{} {:<5} {}] {}{}",
+                buf.timestamp(),
+                record.level(),
+                record.target(),
+                file,
+                record.args()
+            )
+        })
+        .init();
 
     let mut config = RdfConfig::default();
     config.doppler.method = args.method;
@@ -188,44 +213,112 @@ fn main() -> anyhow::Result<()> {
         None
     };
 
-    let results: Vec<FileAnalysis> = args
-        .files
-        .iter()
-        .map(|path| {
-            analyze_file(
-                path,
-                &config,
-                args.no_bearing,
-                trim_opts.as_ref(),
-                args.remove_dc,
-                args.dump_audio.as_deref(),
-            )
-        })
-        .collect();
+    // Files are independent, so worker threads pull the next unclaimed file
+    // from a shared index until none remain. Results are stored by argument
+    // position to keep output stable.
+    let workers = std::thread::available_parallelism()
+        .map(|n| n.get())
+        .unwrap_or(1)
+        .min(args.files.len());
+    let config_ref = &config;
+    let trim_opts_ref = trim_opts.as_ref();
+    let no_bearing = args.no_bearing;
+    let remove_dc = args.remove_dc;
+    let dump_paths = dump_paths(&args.files, args.dump_audio.as_deref());
+    let next = AtomicUsize::new(0);
+
+    let mut slots: Vec<Option<FileAnalysis>> = Vec::new();
+    slots.resize_with(args.files.len(), || None);
+    std::thread::scope(|scope| {
+        let handles: Vec<_> = (0..workers)
+            .map(|_| {
+                scope.spawn(|| {
+                    let mut done = Vec::new();
+                    loop {
+                        let i = next.fetch_add(1, Ordering::Relaxed);
+                        let Some(path) = args.files.get(i) else {
+                            break;
+                        };
+                        CURRENT_FILE.set(Some(path.clone()));
+                        done.push((
+                            i,
+                            analyze_file(
+                                path,
+                                config_ref,
+                                no_bearing,
+                                trim_opts_ref,
+                                remove_dc,
+                                dump_paths[i].as_deref(),
+                            ),
+                        ));
+                    }
+                    done
+                })
+            })
+            .collect();
+        for handle in handles {
+            let done = handle
+                .join()
+                .unwrap_or_else(|e| std::panic::resume_unwind(e));
+            for (i, analysis) in done {
+                slots[i] = Some(analysis);
+            }
+        }
+    });
+    let results: Vec<FileAnalysis> = slots.into_iter().flatten().collect();
 
     match args.format {
-        OutputFormat::Text => print_text(&results, &config),
-        OutputFormat::Csv => print_csv(&results),
+        OutputFormat::Text => print_text(&results, &config)?,
+        OutputFormat::Csv => print_csv(&results)?,
         OutputFormat::Json => print_json(&results)?,
     }
 
     Ok(())
 }
 
+/// Per-file dump paths under `dump_dir`. Files run concurrently, so inputs
+/// sharing a file stem get the argument index in the name instead of
+/// overwriting each other.
+fn dump_paths(files: &[PathBuf], dump_dir: Option<&std::path::Path>) -> Vec<Option<PathBuf>> {
+    let Some(dump_dir) = dump_dir else {
+        return vec![None; files.len()];
+    };
+    let stems: Vec<String> = files
+        .iter()
+        .map(|path| {
+            path.file_stem()
+                .map(|s| s.to_string_lossy().to_string())
+                .unwrap_or_else(|| "output".to_string())
+        })
+        .collect();
+    stems
+        .iter()
+        .enumerate()
+        .map(|(i, stem)| {
+            let name = if stems.iter().filter(|s| *s == stem).count() > 1 {
+                format!("{}_{}_split.wav", stem, i)
+            } else {
+                format!("{}_split.wav", stem)
+            };
+            Some(dump_dir.join(name))
+        })
+        .collect()
+}
+
 fn analyze_file(
     path: &PathBuf,
     config: &RdfConfig,
     no_bearing: bool,
     trim_opts: Option<&TrimOptions>,
     remove_dc: bool,
-    dump_audio: Option<&std::path::Path>,
+    dump_path: Option<&std::path::Path>,
 ) -> FileAnalysis {
     let filename = path
         .file_name()
         .map(|s| s.to_string_lossy().to_string())
         .unwrap_or_else(|| path.display().to_string());
 
-    match analyze_file_impl(path, config, no_bearing, trim_opts, remove_dc, dump_audio) {
+    match analyze_file_impl(path, config, no_bearing, trim_opts, remove_dc, dump_path) {
         Ok(analysis) => analysis,
         Err(e) => FileAnalysis {
             filename,
@@ -307,7 +400,7 @@ fn analyze_file_impl(
     no_bearing: bool,
     trim_opts: Option<&TrimOptions>,
     remove_dc: bool,
-    dump_audio: Option<&std::path::Path>,
+    dump_path: Option<&std::path::Path>,
 ) -> anyhow::Result<FileAnalysis> {
     let filename = path
         .file_name()
@@ -335,7 +428,7 @@ fn analyze_file_impl(
 
         let tick_results = processor.process_audio(&audio_data);
 
-        if dump_audio.is_some() {
+        if dump_path.is_some() {
             let filtered_doppler = processor.filtered_doppler();
             let filtered_north = processor.filtered_north();
             for (&d, &n) in filtered_doppler.iter().zip(filtered_north.iter()) {
@@ -432,14 +525,10 @@ fn analyze_file_impl(
         range: s.range * scale,
     });
 
-    if let Some(dump_dir) = dump_audio {
-        let stem = path
-            .file_stem()
-            .map(|s| s.to_string_lossy().to_string())
-            .unwrap_or_else(|| "output".to_string());
-        let dump_path = dump_dir.join(format!("{}_split.wav", stem));
+    if let Some(dump_path) = dump_path {
         eprintln!(
-            "Writing {} samples to {}",
+            "{}: Writing {} samples to {}",
+            path.display(),
             dump_samples.len() / 2,
             dump_path.display()
         );
@@ -466,22 +555,24 @@ fn analyze_file_impl(
     })
 }
 
-fn print_text(results: &[FileAnalysis], config: &RdfConfig) {
+fn print_text(results: &[FileAnalysis], config: &RdfConfig) -> std::io::Result<()> {
     eprintln!(
         "Channels: Doppler={:?}, NorthTick={:?}",
         config.audio.doppler_channel, config.audio.north_tick_channel
     );
     eprintln!();
 
-    println!(
+    let mut out = BufWriter::new(std::io::stdout().lock());
+    writeln!(
+        out,
         "{:<60} {:>12} {:>8} {:>10} {:>10} {:>8}",
         "File", "Rotation", "Std", "LockQual", "PhaseVar", "Samples"
-    );
-    println!("{}", "-".repeat(113));
+    )?;
+    writeln!(out, "{}", "-".repeat(113))?;
 
     for result in results {
         if let Some(ref err) = result.error {
-            println!("{:<60} ERROR: {}", result.filename, err);
+            writeln!(out, "{:<60} ERROR: {}", result.filename, err)?;
             continue;
         }
 
@@ -505,11 +596,16 @@ fn print_text(results: &[FileAnalysis], config: &RdfConfig) {
             .map(|v| format!("{:.6}", v))
             .unwrap_or_else(|| "-".to_string());
 
-        println!(
+        writeln!(
+            out,
             "{:<60} {:>12} {:>8} {:>10} {:>10} {:>8}",
             result.filename, rotation_mean, rotation_std, lock_qual, phase_var, result.sample_count
-        );
+        )?;
     }
+    // Flush before the per-file details go to stderr so the two streams
+    // stay in order on a terminal.
+    out.flush()?;
+    drop(out);
 
     for result in results {
         if result.error.is_some() {
@@ -556,12 +652,16 @@ fn print_text(results: &[FileAnalysis], config: &RdfConfig) {
             eprintln!("  Range: {:.1}°", bearing.range);
         }
     }
+
+    Ok(())
 }
 
-fn print_csv(results: &[FileAnalysis]) {
-    println!(
+fn print_csv(results: &[FileAnalysis]) -> std::io::Result<()> {
+    let mut out = BufWriter::new(std::io::stdout().lock());
+    writeln!(
+        out,
         "filename,rotation_mean,rotation_std,lock_quality,phase_error_variance,bearing_mean,bearing_std,raw_period_us,raw_jitter_us,dpll_period_us,dpll_jitter_us,sample_count,error"
-    );
+    )?;
     for result in results {
         let rotation_mean = result
             .rotation_freq
@@ -614,7 +714,8 @@ fn print_csv(results: &[FileAnalysis]) {
             .unwrap_or_default();
         let error = result.error.as_deref().unwrap_or("");
 
-        println!(
+        writeln!(
+            out,
             "{},{},{},{},{},{},{},{},{},{},{},{},{}",
             result.filename,
             rotation_mean,
@@ -629,8 +730,9 @@ fn print_csv(results: &[FileAnalysis]) {
             dpll_jitter,
             result.sample_count,
             error
-        );
+        )?;
     }
+    out.flush()
 }
 
 fn print_json(results: &[FileAnalysis]) -> anyhow::Result<()> {
@@ -638,3 +740,45 @@ fn print_json(results: &[FileAnalysis]) -> anyhow::Result<()> {
     println!("{}", json);
     Ok(())
 }
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+
+    fn paths(names: &[&str]) -> Vec<PathBuf> {
+        names.iter().map(PathBuf::from).collect()
+    }
+
+    #[test]
+    fn test_dump_paths_unique_stems() {
+        let files = paths(&["a/one.wav", "b/two.wav"]);
+        let dump = dump_paths(&files, Some(std::path::Path::new("out")));
+        assert_eq!(
+            dump,
+            vec![
+                Some(PathBuf::from("out/one_split.wav")),
+                Some(PathBuf::from("out/two_split.wav")),
+            ]
+        );
+    }
+
+    #[test]
+    fn test_dump_paths_duplicate_stems_across_directories() {
+        let files = paths(&["a/rec.wav", "b/rec.wav", "c/other.wav"]);
+        let dump = dump_paths(&files, Some(std::path::Path::new("out")));
+        assert_eq!(
+            dump,
+            vec![
+                Some(PathBuf::from("out/rec_0_split.wav")),
+                Some(PathBuf::from("out/rec_1_split.wav")),
+                Some(PathBuf::from("out/other_split.wav")),
+            ]
+        );
+    }
+
+    #[test]
+    fn test_dump_paths_without_dump_dir() {
+        let files = paths(&["a/rec.wav", "b/rec.wav"]);
+        assert_eq!(dump_paths(&files, None), vec![None, None]);
+    }
+}